@@ -10,10 +10,14 @@ Key Concepts:
 - Safe and controllable assistants
 """
 
+from collections import deque
 from dataclasses import dataclass
 from typing import Callable, Optional, Any
 from enum import Enum
 
+# Cap on logged violations; oldest entries are dropped first
+MAX_VIOLATIONS = 1_000
+
 
 class RuleResult(Enum):
     """Result of a rule check."""
@@ -48,7 +52,7 @@ class GuardRails:
 
     def __init__(self):
         self._rules: list[Rule] = []
-        self._violations: list[dict] = []
+        self._violations: deque[dict] = deque(maxlen=MAX_VIOLATIONS)
         self._setup_default_rules()
 
     def _setup_default_rules(self):
@@ -191,7 +195,7 @@ class GuardRails:
 
     def get_violations(self) -> list[dict]:
         """Get the violation log."""
-        return self._violations.copy()
+        return list(self._violations)
 
     def clear_violations(self) -> None:
         """Clear the violation log."""
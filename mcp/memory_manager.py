@@ -12,10 +12,17 @@ Responsibilities:
 This separation ensures state is centralized and controllable.
 """
 
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Any, Optional
 from datetime import datetime
 
+# Cap on history rows kept per session; oldest entries are dropped first
+MAX_HISTORY = 10_000
+
+# Values longer than this are truncated in context strings
+MAX_VALUE_LENGTH = 100
+
 
 @dataclass
 class MemoryEntry:
@@ -40,7 +47,7 @@ class MemoryManager:
 
     def __init__(self):
         self._memory: dict[str, MemoryEntry] = {}
-        self._history: list[dict] = []
+        self._history: deque[dict] = deque(maxlen=MAX_HISTORY)
         self._session_start = datetime.now().isoformat()
 
     def store(
@@ -70,6 +77,26 @@ class MemoryManager:
             "timestamp": entry.timestamp
         })
 
+    def store_many(self, items: list[tuple[str, Any, str]]) -> None:
+        """
+        Store several values at once, logged as a single history entry.
+
+        Args:
+            items: (key, value, category) tuples
+        """
+        timestamp = datetime.now().isoformat()
+        for key, value, category in items:
+            self._memory[key] = MemoryEntry(
+                key=key, value=value, category=category, timestamp=timestamp
+            )
+
+        self._history.append({
+            "action": "store_many",
+            "keys": [key for key, _, _ in items],
+            "count": len(items),
+            "timestamp": timestamp
+        })
+
     def retrieve(self, key: str, default: Any = None) -> Any:
         """Retrieve a value from memory."""
         entry = self._memory.get(key)
@@ -97,6 +124,10 @@ class MemoryManager:
             if entry.category == category
         }
 
+    def is_empty(self) -> bool:
+        """Check whether memory holds no entries."""
+        return not self._memory
+
     def get_all_keys(self) -> list[str]:
         """Get all memory keys."""
         return list(self._memory.keys())
@@ -147,8 +178,8 @@ class MemoryManager:
             for key, value in items:
                 # Truncate long values
                 value_str = str(value)
-                if len(value_str) > 100:
-                    value_str = value_str[:100] + "..."
+                if len(value_str) > MAX_VALUE_LENGTH:
+                    value_str = f"{value_str[:MAX_VALUE_LENGTH]}..."
                 lines.append(f"  {key}: {value_str}")
 
         return "\n".join(lines)
@@ -164,27 +195,28 @@ class MemoryManager:
         Returns:
             Number of entries cleared.
         """
+        timestamp = datetime.now().isoformat()
+        old_count = len(self._memory)
+
         if category is None:
-            count = len(self._memory)
-            self._memory.clear()
+            self._memory = {}
         else:
-            keys_to_delete = [
-                key for key, entry in self._memory.items()
-                if entry.category == category
-            ]
-            for key in keys_to_delete:
-                del self._memory[key]
-            count = len(keys_to_delete)
+            # Rebuild in one pass rather than deleting keys one at a time
+            self._memory = {
+                key: entry for key, entry in self._memory.items()
+                if entry.category != category
+            }
+        count = old_count - len(self._memory)
 
         self._history.append({
             "action": "clear",
             "category": category,
             "count": count,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         })
 
         return count
 
     def get_history(self) -> list[dict]:
         """Get memory operation history."""
-        return self._history.copy()
+        return list(self._history)
@@ -140,8 +140,7 @@ class Orchestrator:
             return f"No results found for: {query}"
 
         lines = [f"Search results for '{query}':"]
-        for key, value in results:
-            lines.append(f"  - {key}: {str(value)[:50]}...")
+        lines.extend(f"  - {key}: {str(value)[:50]}..." for key, value in results)
         return "\n".join(lines)
 
     def process(self, user_input: str) -> str:
@@ -174,12 +173,13 @@ class Orchestrator:
         # Add context hierarchy (Lab 6)
         parts.append(self.context_hierarchy.get_full_context())
 
-        # Add persistent memory
-        if self.persistent_memory:
+        # Add persistent memory (skipped on cold start)
+        if self.persistent_memory and not self.persistent_memory.is_empty():
             parts.append(self.persistent_memory.to_context_string())
 
         # Add session memory
-        parts.append(self.session_memory.to_context_string())
+        if not self.session_memory.is_empty():
+            parts.append(self.session_memory.to_context_string())
 
         return "\n\n".join(parts)
 
@@ -236,14 +236,12 @@ class Orchestrator:
         steps = self.reasoner.generate_plan(goal, context)
 
         # Store goal in persistent memory if available
-        if self.persistent_memory:
-            self.persistent_memory.store("current_goal", goal, category="task")
-            self.persistent_memory.store("current_plan", steps, category="task")
-            self.persistent_memory.store("current_step", 0, category="task")
-        else:
-            self.session_memory.store("current_goal", goal, category="task")
-            self.session_memory.store("current_plan", steps, category="task")
-            self.session_memory.store("current_step", 0, category="task")
+        memory = self.persistent_memory or self.session_memory
+        memory.store_many([
+            ("current_goal", goal, "task"),
+            ("current_plan", steps, "task"),
+            ("current_step", 0, "task"),
+        ])
 
         lines = [f"Goal: {goal}", "", "Plan:"]
         for i, step in enumerate(steps, 1):
@@ -290,15 +288,14 @@ class Orchestrator:
         """Get the current system status including guardrails."""
         lines = ["=== MCP Status ===", ""]
 
-        # Memory stats
+        # Memory stats (counts only - avoid building full stats/snapshots)
         if self.persistent_memory:
-            stats = self.persistent_memory.get_stats()
-            lines.append(f"Persistent memory: {stats['total_entries']} entries")
-            lines.append(f"Categories: {', '.join(stats['categories']) if stats['categories'] else 'none'}")
+            categories = self.persistent_memory.get_categories()
+            lines.append(f"Persistent memory: {len(self.persistent_memory.list_keys())} entries")
+            lines.append(f"Categories: {', '.join(categories) if categories else 'none'}")
 
         # Session memory
-        snapshot = self.session_memory.get_snapshot()
-        lines.append(f"Session memory: {snapshot['entry_count']} entries")
+        lines.append(f"Session memory: {len(self.session_memory.get_all_keys())} entries")
 
         # Current goal
         memory = self.persistent_memory or self.session_memory
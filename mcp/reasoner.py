@@ -12,13 +12,97 @@ Responsibilities:
 This separation ensures LLM calls are isolated and controllable.
 """
 
+import asyncio
+import hashlib
+import json
 import os
-from typing import Optional
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 load_dotenv()
 
+# Response cache settings. Only near-deterministic calls are cached.
+CACHE_MAX_TEMPERATURE = 0.4
+CACHE_MEMORY_ENTRIES = 512
+CACHE_DISK_ENTRIES = 10_000
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Static instruction blocks. These are sent first and kept byte-identical
+# across calls so the provider's prompt-prefix cache can reuse them; only
+# the per-call fields go at the end of the conversation.
+INTENT_INSTRUCTIONS = """Analyze the user input and determine their intent.
+
+Return a JSON object with:
+- "type": one of ["question", "command", "goal", "clarification"]
+- "action": what they want to do
+- "details": any specific details
+
+Only return the JSON, nothing else."""
+
+# Structured output schema so the model returns valid intent JSON directly
+INTENT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "Intent",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "enum": ["question", "command", "goal", "clarification"]},
+                "action": {"type": "string"},
+                "details": {"type": "string"}
+            },
+            "required": ["type", "action", "details"],
+            "additionalProperties": False
+        }
+    }
+}
+
+PLAN_INSTRUCTIONS = """Create a plan to achieve the given goal.
+
+Return a numbered list of 3-5 concrete steps.
+Only return the list, nothing else."""
+
+DECIDE_INSTRUCTIONS = """Given the situation, choose the best option.
+
+Return only the chosen option text, nothing else."""
+
+RESPONSE_INSTRUCTIONS = """You are a helpful coding assistant. Answer the query.
+
+Be concise and provide code examples when appropriate."""
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json_object(text: str) -> Optional[dict]:
+    """
+    Return the first well-formed JSON object embedded in text.
+
+    Tolerates prose, code fences, and trailing snippets around the object.
+    """
+    start = text.find('{')
+    while start >= 0:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+    return None
+
+
+def _parse_step(line: str) -> Optional[str]:
+    """Extract the step text from a numbered plan line like "1. Do X"."""
+    line = line.strip()
+    if line and line[0].isdigit():
+        return line.split('.', 1)[-1].strip() or None
+    return None
+
 
 class Reasoner:
     """
@@ -31,24 +115,129 @@ class Reasoner:
     - Control costs
     """
 
-    def __init__(self, model: str = "gpt-4o-mini"):
+    def __init__(self, model: str = "gpt-4o-mini", cache_path: Optional[str] = None):
+        """
+        Args:
+            model: OpenAI model name
+            cache_path: Optional sqlite file that persists cached responses
+                        across sessions (e.g. "memory/data/reason_cache.sqlite")
+        """
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = model
-
-    def reason(self, prompt: str, context: str = "", temperature: float = 0.7) -> str:
+        self._usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._cache_stats = {"hits": 0, "misses": 0}
+        self._cache_db = self._open_cache_db(cache_path) if cache_path else None
+
+    def reason(
+        self,
+        prompt: str,
+        context: str = "",
+        temperature: float = 0.7,
+        instructions: str = "",
+        response_format: Optional[dict] = None
+    ) -> str:
         """
         Core reasoning method - send a prompt to the LLM.
 
+        Messages are ordered from most to least stable (instructions,
+        context, prompt) so repeated calls share a cacheable prefix.
+
         Args:
             prompt: The main instruction/question
             context: Additional context to include
             temperature: Creativity level (0-1)
+            instructions: Static instructions sent ahead of everything else
+            response_format: Optional OpenAI response_format (e.g. a JSON schema)
 
         Returns:
             The LLM's response
         """
+        request = self._build_request(prompt, context, temperature, instructions, response_format)
+        cache_key, cached = self._check_cache(request)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self.client.chat.completions.create(**request)
+            return self._handle_response(response, cache_key)
+        except Exception as e:
+            return f"Reasoning error: {str(e)}"
+
+    def reason_stream(
+        self,
+        prompt: str,
+        context: str = "",
+        temperature: float = 0.7,
+        instructions: str = ""
+    ) -> Iterator[str]:
+        """
+        Stream the LLM's response as it is generated.
+
+        Takes the same arguments as reason() and yields text fragments,
+        so callers can act on output before generation finishes.
+        Streamed calls bypass the response cache.
+        """
+        request = self._build_request(prompt, context, temperature, instructions, None)
+
+        try:
+            for chunk in self.client.chat.completions.create(**request, stream=True):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"Reasoning error: {str(e)}"
+
+    async def areason(
+        self,
+        prompt: str,
+        context: str = "",
+        temperature: float = 0.7,
+        instructions: str = "",
+        response_format: Optional[dict] = None
+    ) -> str:
+        """
+        Async version of reason() so independent calls can overlap.
+
+        Takes the same arguments and shares the same response cache.
+        """
+        request = self._build_request(prompt, context, temperature, instructions, response_format)
+        cache_key, cached = self._check_cache(request)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.aclient.chat.completions.create(**request)
+            return self._handle_response(response, cache_key)
+        except Exception as e:
+            return f"Reasoning error: {str(e)}"
+
+    async def batch_reason(self, calls: list[dict]) -> list[str]:
+        """
+        Run several independent reasoning calls concurrently.
+
+        Args:
+            calls: List of keyword-argument dicts for areason()
+
+        Returns:
+            Responses in the same order as calls
+        """
+        return list(await asyncio.gather(*(self.areason(**call) for call in calls)))
+
+    def _build_request(
+        self,
+        prompt: str,
+        context: str,
+        temperature: float,
+        instructions: str,
+        response_format: Optional[dict]
+    ) -> dict:
+        """Build the chat completion arguments, most stable content first."""
         messages = []
 
+        if instructions:
+            messages.append({"role": "system", "content": instructions})
+
         if context:
             messages.append({
                 "role": "system",
@@ -57,16 +246,118 @@ class Reasoner:
 
         messages.append({"role": "user", "content": prompt})
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=1000
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 1000
+        }
+        if response_format:
+            request["response_format"] = response_format
+        return request
+
+    def _check_cache(self, request: dict) -> tuple[Optional[str], Optional[str]]:
+        """Return (cache key, cached response) - key is None if uncacheable."""
+        if request["temperature"] >= CACHE_MAX_TEMPERATURE:
+            return None, None
+        cache_key = self._cache_key(request)
+        return cache_key, self._cache_get(cache_key)
+
+    def _handle_response(self, response, cache_key: Optional[str]) -> str:
+        """Record usage, cache the result if allowed, and return its text."""
+        self._record_usage(response)
+        content = response.choices[0].message.content
+        if cache_key and content is not None:
+            self._cache_put(cache_key, content)
+        return content
+
+    def _open_cache_db(self, cache_path: str) -> sqlite3.Connection:
+        """Open (and create if needed) the on-disk response cache."""
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        db = sqlite3.connect(cache_path, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS reason_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        # Eviction walks entries newest first; without an index every
+        # _cache_put() would sort the whole table
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS reason_cache_created_at "
+            "ON reason_cache (created_at)"
+        )
+        return db
+
+    def _cache_key(self, request: dict) -> str:
+        """Hash the normalized request into a cache key."""
+        payload = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Look up a cached response, in memory first and then on disk."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._cache_stats["hits"] += 1
+            return self._cache[key]
+
+        if self._cache_db is not None:
+            row = self._cache_db.execute(
+                "SELECT response FROM reason_cache WHERE key = ? AND created_at > ?",
+                (key, time.time() - CACHE_TTL_SECONDS)
+            ).fetchone()
+            if row:
+                self._remember(key, row[0])
+                self._cache_stats["hits"] += 1
+                return row[0]
+
+        self._cache_stats["misses"] += 1
+        return None
+
+    def _cache_put(self, key: str, response: str) -> None:
+        """Store a response in memory and, if enabled, on disk."""
+        self._remember(key, response)
+
+        if self._cache_db is not None:
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO reason_cache (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, time.time())
+            )
+            self._cache_db.execute(
+                "DELETE FROM reason_cache WHERE key IN ("
+                "SELECT key FROM reason_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (CACHE_DISK_ENTRIES,)
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Reasoning error: {str(e)}"
+
+    def _remember(self, key: str, response: str) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry if full."""
+        self._cache[key] = response
+        self._cache.move_to_end(key)
+        if len(self._cache) > CACHE_MEMORY_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def cache_stats(self) -> dict:
+        """Get response cache hit/miss counts."""
+        lookups = self._cache_stats["hits"] + self._cache_stats["misses"]
+        return {
+            **self._cache_stats,
+            "size": len(self._cache),
+            "hit_rate": self._cache_stats["hits"] / lookups if lookups else 0.0
+        }
+
+    def _record_usage(self, response) -> None:
+        """Accumulate prompt and cached token counts from a response."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        self._usage["calls"] += 1
+        self._usage["prompt_tokens"] += usage.prompt_tokens or 0
+        self._usage["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+    def get_usage(self) -> dict:
+        """Get token usage totals, including prompt-cache hits."""
+        return self._usage.copy()
 
     def interpret_intent(self, user_input: str, context: str = "") -> dict:
         """
@@ -74,29 +365,19 @@ class Reasoner:
 
         Returns a structured intent object.
         """
-        prompt = f"""Analyze this user input and determine their intent.
-
-User input: {user_input}
+        response = self.reason(
+            f"User input: {user_input}", context,
+            temperature=0.3, instructions=INTENT_INSTRUCTIONS,
+            response_format=INTENT_RESPONSE_FORMAT
+        ) or ""
 
-Return a JSON object with:
-- "type": one of ["question", "command", "goal", "clarification"]
-- "action": what they want to do
-- "details": any specific details
-
-Only return the JSON, nothing else."""
-
-        response = self.reason(prompt, context, temperature=0.3)
-
-        # Parse JSON (simple extraction)
+        # Structured output is plain JSON; scan for an object only as a fallback
         try:
-            import json
-            # Find JSON in response
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start >= 0 and end > start:
-                return json.loads(response[start:end])
-        except:
-            pass
+            intent = json.loads(response)
+        except json.JSONDecodeError:
+            intent = _extract_json_object(response)
+        if isinstance(intent, dict):
+            return intent
 
         return {"type": "question", "action": user_input, "details": ""}
 
@@ -106,24 +387,43 @@ Only return the JSON, nothing else."""
 
         Returns a list of steps.
         """
-        prompt = f"""Create a plan to achieve this goal:
+        response = self.reason(
+            f"Goal: {goal}", context,
+            temperature=0.3, instructions=PLAN_INSTRUCTIONS
+        )
 
-Goal: {goal}
-
-Return a numbered list of 3-5 concrete steps.
-Only return the list, nothing else."""
+        steps = [step for step in map(_parse_step, response.strip().split('\n')) if step]
+        return steps if steps else [f"Complete: {goal}"]
 
-        response = self.reason(prompt, context, temperature=0.3)
+    def stream_plan(self, goal: str, context: str = "") -> Iterator[str]:
+        """
+        Generate a plan, yielding each step as soon as its line is complete.
 
-        steps = []
-        for line in response.strip().split('\n'):
-            line = line.strip()
-            if line and line[0].isdigit():
-                step = line.split('.', 1)[-1].strip()
+        Streaming version of generate_plan() for callers that render
+        progressively.
+        """
+        buffer = ""
+        found = False
+
+        for fragment in self.reason_stream(
+            f"Goal: {goal}", context,
+            temperature=0.3, instructions=PLAN_INSTRUCTIONS
+        ):
+            buffer += fragment
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                step = _parse_step(line)
                 if step:
-                    steps.append(step)
+                    found = True
+                    yield step
 
-        return steps if steps else [f"Complete: {goal}"]
+        step = _parse_step(buffer)
+        if step:
+            found = True
+            yield step
+
+        if not found:
+            yield f"Complete: {goal}"
 
     def decide_action(self, situation: str, options: list[str], context: str = "") -> str:
         """
@@ -131,27 +431,19 @@ Only return the list, nothing else."""
 
         Returns the chosen option.
         """
-        options_str = "\n".join(f"- {opt}" for opt in options)
-        prompt = f"""Given this situation, choose the best option.
+        prompt = "\n".join([f"Situation: {situation}", "", "Options:", *(f"- {opt}" for opt in options)])
 
-Situation: {situation}
-
-Options:
-{options_str}
-
-Return only the chosen option text, nothing else."""
-
-        response = self.reason(prompt, context, temperature=0.3)
+        response = self.reason(
+            prompt, context,
+            temperature=0.3, instructions=DECIDE_INSTRUCTIONS
+        )
         return response.strip()
 
     def generate_response(self, query: str, context: str = "") -> str:
         """
         Generate a helpful response to a query.
         """
-        prompt = f"""You are a helpful coding assistant. Answer this query:
-
-{query}
-
-Be concise and provide code examples when appropriate."""
-
-        return self.reason(prompt, context, temperature=0.7)
+        return self.reason(
+            query, context,
+            temperature=0.7, instructions=RESPONSE_INSTRUCTIONS
+        )
@@ -12,6 +12,7 @@ Responsibilities:
 This separation ensures actions are controlled and auditable.
 """
 
+from collections import deque
 from typing import Callable, Any, Optional
 from dataclasses import dataclass, field
 
@@ -42,9 +43,14 @@ class ToolHandler:
     actual actions in the world (read files, execute code, etc.)
     """
 
-    def __init__(self):
+    def __init__(self, max_log_entries: int = 10_000):
+        """
+        Args:
+            max_log_entries: Execution log size; oldest entries are dropped first
+        """
         self._tools: dict[str, Tool] = {}
-        self._execution_log: list[dict] = []
+        self._execution_log: deque[dict] = deque(maxlen=max_log_entries)
+        self._list_cache: Optional[list[dict]] = None
 
     def register_tool(
         self,
@@ -62,18 +68,26 @@ class ToolHandler:
             parameters=parameters or {},
             requires_confirmation=requires_confirmation
         )
+        self._list_cache = None
 
     def list_tools(self) -> list[dict]:
-        """List all available tools."""
-        return [
-            {
-                "name": t.name,
-                "description": t.description,
-                "parameters": t.parameters,
-                "requires_confirmation": t.requires_confirmation
-            }
-            for t in self._tools.values()
-        ]
+        """
+        List all available tools.
+
+        The list is built once and reused until a tool is registered;
+        callers should treat it as read-only.
+        """
+        if self._list_cache is None:
+            self._list_cache = [
+                {
+                    "name": t.name,
+                    "description": t.description,
+                    "parameters": t.parameters,
+                    "requires_confirmation": t.requires_confirmation
+                }
+                for t in self._tools.values()
+            ]
+        return self._list_cache
 
     def get_tool(self, name: str) -> Optional[Tool]:
         """Get a tool by name."""
@@ -122,7 +136,7 @@ class ToolHandler:
 
     def get_execution_log(self) -> list[dict]:
         """Get the history of tool executions."""
-        return self._execution_log.copy()
+        return list(self._execution_log)
 
     def clear_log(self) -> None:
         """Clear the execution log."""
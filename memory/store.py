@@ -6,16 +6,62 @@ Lab 5: Adding persistent memory that survives across sessions.
 Key Concepts:
 - Persistent vs ephemeral state
 - Memory that survives restarts
-- JSON-based storage for simplicity
+- SQLite-backed storage so each change writes one row, not the whole store
 """
 
+import atexit
+import bisect
 import json
 import os
+import sqlite3
 from pathlib import Path
 from datetime import datetime
 from typing import Any, Optional
 from dataclasses import dataclass, field, asdict
 
+try:
+    import orjson
+except ImportError:  # optional - fall back to the stdlib json module
+    orjson = None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mem (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    category TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    access_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Buffered access-count updates are flushed after this many reads
+FLUSH_EVERY = 50
+
+# Above this many records, search() scans one concatenated string instead
+SEARCH_BLOB_THRESHOLD = 500
+
+_REPLACE = """
+INSERT OR REPLACE INTO mem (key, value, category, created_at, updated_at, access_count)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def _dumps(data: Any, indent: bool = False) -> str:
+    """Serialize to JSON, using orjson when it's installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=str, option=option).decode()
+    return json.dumps(data, indent=2 if indent else None, default=str)
+
+
+def _loads(data: str | bytes) -> Any:
+    """Deserialize JSON, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 @dataclass
 class MemoryRecord:
@@ -30,35 +76,110 @@ class MemoryRecord:
 
 class PersistentMemory:
     """
-    Persistent memory storage using JSON files.
+    Persistent memory storage backed by SQLite.
 
     This enables the assistant to remember information
     across sessions - a key requirement for continuity.
+
+    All records are loaded into memory on startup so reads never
+    touch disk; each write updates only the affected rows.
     """
 
     def __init__(self, storage_path: str = "memory/data"):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
-        self._memory_file = self.storage_path / "memory.json"
+        self._db_file = self.storage_path / "memory.sqlite"
+        self._db = sqlite3.connect(self._db_file, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
         self._memory: dict[str, MemoryRecord] = {}
+        # key -> (lowercased key, lowercased value or None) for search()
+        self._lower_index: dict[str, tuple[str, Optional[str]]] = {}
+        # category -> keys, as insertion-ordered dicts so output order is stable
+        self._by_category: dict[str, dict[str, None]] = {}
+        # Lazily built (haystack, record start offsets, keys) for large searches
+        self._search_blob: Optional[tuple[str, list[int], list[str]]] = None
+        self._dirty: set[str] = set()  # keys with unsaved access bookkeeping
+        self._reads_since_flush = 0
         self._load()
+        atexit.register(self.flush)
 
     def _load(self) -> None:
         """Load memory from disk."""
-        if self._memory_file.exists():
-            try:
-                with open(self._memory_file, 'r') as f:
-                    data = json.load(f)
-                    for key, record_data in data.items():
-                        self._memory[key] = MemoryRecord(**record_data)
-            except (json.JSONDecodeError, TypeError):
-                self._memory = {}
-
-    def _save(self) -> None:
-        """Save memory to disk."""
-        data = {key: asdict(record) for key, record in self._memory.items()}
-        with open(self._memory_file, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        rows = self._db.execute(
+            "SELECT key, value, category, created_at, updated_at, access_count FROM mem"
+        ).fetchall()
+
+        for key, value, category, created_at, updated_at, access_count in rows:
+            record = MemoryRecord(
+                key=key,
+                value=self._decode(value),
+                category=category,
+                created_at=created_at,
+                updated_at=updated_at,
+                access_count=access_count
+            )
+            self._memory[key] = record
+            self._index(record)
+
+        if not self._memory:
+            self._migrate_json()
+
+    def _migrate_json(self) -> None:
+        """One-time import of the memory.json file used by earlier versions."""
+        legacy_file = self.storage_path / "memory.json"
+        if not legacy_file.exists():
+            return
+
+        try:
+            self.import_from(str(legacy_file))
+        except (json.JSONDecodeError, TypeError):
+            return
+        legacy_file.rename(legacy_file.with_name("memory.json.bak"))
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        """Serialize a value for storage."""
+        return _dumps(value)
+
+    @staticmethod
+    def _decode(value: str) -> Any:
+        """Deserialize a stored value."""
+        try:
+            return _loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
+
+    def _write_records(self, records: list[MemoryRecord]) -> None:
+        """Upsert records to disk in a single transaction."""
+        rows = [
+            (r.key, self._encode(r.value), r.category,
+             r.created_at, r.updated_at, r.access_count)
+            for r in records
+        ]
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(_REPLACE, rows)
+        self._dirty.difference_update(r.key for r in records)
+
+    def flush(self) -> None:
+        """Write buffered access counts and timestamps to disk."""
+        if not self._dirty:
+            return
+
+        rows = [
+            (self._memory[key].access_count, self._memory[key].updated_at, key)
+            for key in self._dirty
+            if key in self._memory
+        ]
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE mem SET access_count = ?, updated_at = ? WHERE key = ?", rows
+            )
+        self._dirty.clear()
+        self._reads_since_flush = 0
 
     def store(self, key: str, value: Any, category: str = "general") -> None:
         """
@@ -69,11 +190,30 @@ class PersistentMemory:
             value: The data to store (must be JSON-serializable)
             category: Category for organization
         """
-        now = datetime.now().isoformat()
+        record = self._upsert(key, value, category, datetime.now().isoformat())
+        self._write_records([record])
+
+    def store_many(self, items: list[tuple[str, Any, str]]) -> None:
+        """
+        Store several values with a single write to disk.
 
+        Args:
+            items: (key, value, category) tuples
+        """
+        now = datetime.now().isoformat()
+        records = [
+            self._upsert(key, value, category, now)
+            for key, value, category in items
+        ]
+        self._write_records(records)
+
+    def _upsert(self, key: str, value: Any, category: str, now: str) -> MemoryRecord:
+        """Create or update a record in memory without saving."""
         if key in self._memory:
             # Update existing
             record = self._memory[key]
+            if record.category != category:
+                self._unindex(record)
             record.value = value
             record.category = category
             record.updated_at = now
@@ -87,48 +227,107 @@ class PersistentMemory:
                 updated_at=now
             )
             self._memory[key] = record
-
-        self._save()
+        self._index(record)
+        return record
+
+    def _index(self, record: MemoryRecord) -> None:
+        """Add a record to the search and category indexes."""
+        value_lower = record.value.lower() if isinstance(record.value, str) else None
+        self._lower_index[record.key] = (record.key.lower(), value_lower)
+        self._search_blob = None
+        self._by_category.setdefault(record.category, {})[record.key] = None
+
+    def _unindex(self, record: MemoryRecord) -> None:
+        """Remove a record from the search and category indexes."""
+        del self._lower_index[record.key]
+        self._search_blob = None
+        keys = self._by_category[record.category]
+        del keys[record.key]
+        if not keys:
+            del self._by_category[record.category]
 
     def retrieve(self, key: str, default: Any = None) -> Any:
-        """Retrieve a value from persistent memory."""
+        """
+        Retrieve a value from persistent memory.
+
+        Access bookkeeping is buffered and written by flush(), which runs
+        every FLUSH_EVERY reads and at exit, so reads stay off the disk.
+        """
         record = self._memory.get(key)
         if record:
             record.access_count += 1
             record.updated_at = datetime.now().isoformat()
-            self._save()
+            self._dirty.add(key)
+            self._reads_since_flush += 1
+            if self._reads_since_flush >= FLUSH_EVERY:
+                self.flush()
             return record.value
         return default
 
     def delete(self, key: str) -> bool:
         """Delete a value from persistent memory."""
         if key in self._memory:
-            del self._memory[key]
-            self._save()
+            self._unindex(self._memory.pop(key))
+            self._dirty.discard(key)
+            self._db.execute("DELETE FROM mem WHERE key = ?", (key,))
             return True
         return False
 
     def list_keys(self, category: Optional[str] = None) -> list[str]:
         """List all keys, optionally filtered by category."""
         if category:
-            return [k for k, v in self._memory.items() if v.category == category]
+            return list(self._by_category.get(category, ()))
         return list(self._memory.keys())
 
+    def is_empty(self) -> bool:
+        """Check whether persistent memory holds no records."""
+        return not self._memory
+
     def get_categories(self) -> list[str]:
         """Get all unique categories."""
-        return list(set(r.category for r in self._memory.values()))
+        return list(self._by_category)
 
     def search(self, query: str) -> list[tuple[str, Any]]:
         """Search memory by key or value content."""
-        results = []
         query_lower = query.lower()
 
-        for key, record in self._memory.items():
-            if query_lower in key.lower():
-                results.append((key, record.value))
-            elif isinstance(record.value, str) and query_lower in record.value.lower():
-                results.append((key, record.value))
+        if len(self._lower_index) > SEARCH_BLOB_THRESHOLD and "\0" not in query_lower:
+            return self._search_blob_scan(query_lower)
+
+        return [
+            (key, self._memory[key].value)
+            for key, (key_lower, value_lower) in self._lower_index.items()
+            if query_lower in key_lower
+            or (value_lower is not None and query_lower in value_lower)
+        ]
 
+    def _search_blob_scan(self, query_lower: str) -> list[tuple[str, Any]]:
+        """
+        Search by scanning one NUL-separated string of all lowercased
+        keys and values, so the matching loop runs in C rather than
+        once per record in Python.
+        """
+        if self._search_blob is None:
+            parts, offsets, keys = [], [], []
+            position = 0
+            for key, (key_lower, value_lower) in self._lower_index.items():
+                part = f"{key_lower}\0{value_lower or ''}\0"
+                parts.append(part)
+                offsets.append(position)
+                keys.append(key)
+                position += len(part)
+            self._search_blob = ("".join(parts), offsets, keys)
+
+        haystack, offsets, keys = self._search_blob
+        results = []
+        pos = haystack.find(query_lower)
+        while pos >= 0:
+            # Map the hit back to its record, then resume at the next record
+            i = bisect.bisect_right(offsets, pos) - 1
+            results.append((keys[i], self._memory[keys[i]].value))
+            if i + 1 >= len(offsets):
+                break
+            pos = haystack.find(query_lower, offsets[i + 1])
         return results
 
     def get_stats(self) -> dict:
@@ -136,7 +335,7 @@ class PersistentMemory:
         return {
             "total_entries": len(self._memory),
             "categories": self.get_categories(),
-            "storage_file": str(self._memory_file),
+            "storage_file": str(self._db_file),
             "most_accessed": sorted(
                 [(k, r.access_count) for k, r in self._memory.items()],
                 key=lambda x: x[1],
@@ -151,19 +350,12 @@ class PersistentMemory:
 
         lines = ["Persistent Memory:"]
 
-        # Group by category
-        by_category: dict[str, list] = {}
-        for key, record in self._memory.items():
-            if record.category not in by_category:
-                by_category[record.category] = []
-            by_category[record.category].append((key, record.value))
-
-        for category, items in by_category.items():
+        for category, keys in self._by_category.items():
             lines.append(f"\n[{category.upper()}]")
-            for key, value in items:
-                value_str = str(value)[:80]
-                if len(str(value)) > 80:
-                    value_str += "..."
+            for key in keys:
+                value_str = str(self._memory[key].value)
+                if len(value_str) > 80:
+                    value_str = f"{value_str[:80]}..."
                 lines.append(f"  {key}: {value_str}")
 
         return "\n".join(lines)
@@ -171,32 +363,44 @@ class PersistentMemory:
     def clear(self, category: Optional[str] = None) -> int:
         """Clear memory entries."""
         if category:
-            keys_to_delete = [k for k, v in self._memory.items() if v.category == category]
+            keys_to_delete = list(self._by_category.get(category, ()))
             for key in keys_to_delete:
-                del self._memory[key]
+                self._unindex(self._memory.pop(key))
             count = len(keys_to_delete)
+            self._dirty.difference_update(keys_to_delete)
+            self._db.execute("DELETE FROM mem WHERE category = ?", (category,))
         else:
             count = len(self._memory)
             self._memory.clear()
+            self._lower_index.clear()
+            self._search_blob = None
+            self._by_category.clear()
+            self._dirty.clear()
+            self._db.execute("DELETE FROM mem")
 
-        self._save()
         return count
 
     def export(self, filepath: str) -> None:
         """Export memory to a file."""
         data = {key: asdict(record) for key, record in self._memory.items()}
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+
+        # Write to a temp file and swap it in so a crash can't leave a torn export
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(_dumps(data, indent=True))
+        os.replace(tmp_path, filepath)
 
     def import_from(self, filepath: str) -> int:
         """Import memory from a file."""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-
-        count = 0
-        for key, record_data in data.items():
-            self._memory[key] = MemoryRecord(**record_data)
-            count += 1
-
-        self._save()
-        return count
+        with open(filepath, 'rb') as f:
+            data = _loads(f.read())
+
+        records = [MemoryRecord(**record_data) for record_data in data.values()]
+        for record in records:
+            if record.key in self._memory:
+                self._unindex(self._memory[record.key])
+            self._memory[record.key] = record
+            self._index(record)
+
+        self._write_records(records)
+        return len(records)
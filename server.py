@@ -6,11 +6,120 @@ Lab 12: Complete MCP Server with resources and tools.
 Implements JSON-RPC 2.0 over stdio for MCP protocol.
 """
 
+import asyncio
+import itertools
 import json
+import os
 import sys
 import subprocess
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+try:
+    import pygit2
+except ImportError:  # optional - fall back to the git CLI
+    pygit2 = None
+
+try:
+    import orjson
+except ImportError:  # optional - fall back to the stdlib json module
+    orjson = None
+
+# Largest single JSON-RPC message accepted from stdin
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+_CONTENT_LENGTH = b"content-length:"
+
+
+def _encode(message: Any) -> bytes:
+    """Serialize a JSON-RPC message, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(message)
+    return json.dumps(message).encode()
+
+
+def _decode(data: bytes) -> Any:
+    """Parse a JSON-RPC message, using orjson when it's installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _subject(message: str) -> str:
+    """Get a commit's subject the way `git log --oneline` prints it."""
+    # The subject is the first paragraph, its lines joined with spaces
+    lines = []
+    for line in message.splitlines():
+        line = line.rstrip()
+        if line:
+            lines.append(line)
+        elif lines:
+            break
+    return " ".join(lines)
+
+
+# Static listings - built once at import instead of per request
+_RESOURCE_LIST = {
+    "resources": [
+        {
+            "uri": "git://status",
+            "name": "Git Status",
+            "description": "Current git repository status",
+            "mimeType": "text/plain"
+        },
+        {
+            "uri": "git://commits",
+            "name": "Recent Commits",
+            "description": "Recent git commit history",
+            "mimeType": "text/plain"
+        },
+        {
+            "uri": "todo://list",
+            "name": "TODO List",
+            "description": "Contents of TODO.md",
+            "mimeType": "text/markdown"
+        }
+    ]
+}
+
+_TOOL_LIST = {
+    "tools": [
+        {
+            "name": "add_todo",
+            "description": "Add an item to TODO.md",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "item": {"type": "string", "description": "Todo item text"},
+                    "priority": {"type": "string", "enum": ["high", "medium", "low"]}
+                },
+                "required": ["item"]
+            }
+        },
+        {
+            "name": "read_file",
+            "description": "Read contents of a file",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "File path"}
+                },
+                "required": ["path"]
+            }
+        },
+        {
+            "name": "analyze_codebase",
+            "description": "Analyze codebase structure",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "Root path", "default": "."}
+                }
+            }
+        }
+    ]
+}
 
 
 class MCPServer:
@@ -31,9 +140,24 @@ class MCPServer:
     def __init__(self):
         self.root_path = Path(".")
         self.todo_file = self.root_path / "TODO.md"
+        self._todo_lock = threading.Lock()
+        self.repo = self._open_repo()
+        self._repo_lock = threading.Lock()
+
+    def _open_repo(self) -> Optional["pygit2.Repository"]:
+        """Open a libgit2 handle kept for the server's lifetime, if available."""
+        if pygit2 is None:
+            return None
+        try:
+            return pygit2.Repository(str(self.root_path))
+        except pygit2.GitError:
+            return None
 
     def handle_request(self, request: dict) -> dict:
         """Handle incoming JSON-RPC request."""
+        if not isinstance(request, dict):
+            return self._error_response(None, -32600, "Invalid Request")
+
         method = request.get("method", "")
         params = request.get("params", {})
         req_id = request.get("id")
@@ -57,6 +181,15 @@ class MCPServer:
         except Exception as e:
             return self._error_response(req_id, -32603, str(e))
 
+    async def handle_request_async(self, request: dict) -> dict:
+        """
+        Handle a request without blocking the event loop.
+
+        Handlers spend most of their time waiting on git subprocesses and
+        file I/O, so they run in a worker thread and overlap with each other.
+        """
+        return await asyncio.to_thread(self.handle_request, request)
+
     def _initialize(self, params: dict) -> dict:
         """Initialize the server."""
         return {
@@ -73,28 +206,7 @@ class MCPServer:
 
     def _list_resources(self) -> dict:
         """List available resources."""
-        return {
-            "resources": [
-                {
-                    "uri": "git://status",
-                    "name": "Git Status",
-                    "description": "Current git repository status",
-                    "mimeType": "text/plain"
-                },
-                {
-                    "uri": "git://commits",
-                    "name": "Recent Commits",
-                    "description": "Recent git commit history",
-                    "mimeType": "text/plain"
-                },
-                {
-                    "uri": "todo://list",
-                    "name": "TODO List",
-                    "description": "Contents of TODO.md",
-                    "mimeType": "text/markdown"
-                }
-            ]
-        }
+        return _RESOURCE_LIST
 
     def _read_resource(self, params: dict) -> dict:
         """Read a resource by URI."""
@@ -117,43 +229,7 @@ class MCPServer:
 
     def _list_tools(self) -> dict:
         """List available tools."""
-        return {
-            "tools": [
-                {
-                    "name": "add_todo",
-                    "description": "Add an item to TODO.md",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "item": {"type": "string", "description": "Todo item text"},
-                            "priority": {"type": "string", "enum": ["high", "medium", "low"]}
-                        },
-                        "required": ["item"]
-                    }
-                },
-                {
-                    "name": "read_file",
-                    "description": "Read contents of a file",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "path": {"type": "string", "description": "File path"}
-                        },
-                        "required": ["path"]
-                    }
-                },
-                {
-                    "name": "analyze_codebase",
-                    "description": "Analyze codebase structure",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "path": {"type": "string", "description": "Root path", "default": "."}
-                        }
-                    }
-                }
-            ]
-        }
+        return _TOOL_LIST
 
     def _call_tool(self, params: dict) -> dict:
         """Call a tool."""
@@ -173,6 +249,15 @@ class MCPServer:
 
     def _get_git_status(self) -> str:
         """Get git status."""
+        if self.repo is not None:
+            try:
+                with self._repo_lock:
+                    status = self._repo_status()
+                if status is not None:
+                    return status or "Working tree clean"
+            except pygit2.GitError:
+                pass  # fall back to the git CLI
+
         try:
             result = subprocess.run(
                 ["git", "status", "--short"],
@@ -184,6 +269,13 @@ class MCPServer:
 
     def _get_git_commits(self) -> str:
         """Get recent commits."""
+        if self.repo is not None:
+            try:
+                with self._repo_lock:
+                    return self._repo_commits() or "No commits"
+            except pygit2.GitError:
+                pass  # fall back to the git CLI
+
         try:
             result = subprocess.run(
                 ["git", "log", "--oneline", "-10"],
@@ -193,6 +285,59 @@ class MCPServer:
         except Exception as e:
             return f"Error: {e}"
 
+    def _repo_status(self) -> Optional[str]:
+        """
+        Format libgit2 status flags like `git status --short`.
+
+        Returns None when the index may hold a rename, which libgit2's
+        status doesn't pair up the way `git status` does.
+        """
+        index_codes = (
+            (pygit2.GIT_STATUS_INDEX_NEW, "A"),
+            (pygit2.GIT_STATUS_INDEX_MODIFIED, "M"),
+            (pygit2.GIT_STATUS_INDEX_DELETED, "D"),
+            (pygit2.GIT_STATUS_INDEX_RENAMED, "R"),
+            (pygit2.GIT_STATUS_INDEX_TYPECHANGE, "T"),
+        )
+        worktree_codes = (
+            (pygit2.GIT_STATUS_WT_MODIFIED, "M"),
+            (pygit2.GIT_STATUS_WT_DELETED, "D"),
+            (pygit2.GIT_STATUS_WT_RENAMED, "R"),
+            (pygit2.GIT_STATUS_WT_TYPECHANGE, "T"),
+        )
+
+        # "normal" lists an untracked directory once, as `dir/`, like the CLI
+        entries = sorted(self.repo.status(untracked_files="normal").items())
+        if (any(flags & pygit2.GIT_STATUS_INDEX_NEW for _, flags in entries)
+                and any(flags & pygit2.GIT_STATUS_INDEX_DELETED for _, flags in entries)):
+            return None
+
+        lines = []
+        untracked = []
+        for path, flags in entries:
+            if flags & pygit2.GIT_STATUS_IGNORED:
+                continue
+            if flags & pygit2.GIT_STATUS_WT_NEW:
+                # git lists untracked paths after all tracked changes
+                untracked.append(f"?? {path}")
+                continue
+            x = next((code for flag, code in index_codes if flags & flag), " ")
+            y = next((code for flag, code in worktree_codes if flags & flag), " ")
+            lines.append(f"{x}{y} {path}")
+
+        return "".join(f"{line}\n" for line in lines + untracked)
+
+    def _repo_commits(self, count: int = 10) -> str:
+        """Format recent commits like `git log --oneline`."""
+        if self.repo.head_is_unborn:
+            return ""
+
+        walker = self.repo.walk(self.repo.head.target, pygit2.GIT_SORT_TIME)
+        return "".join(
+            f"{commit.short_id} {_subject(commit.message)}\n"
+            for commit in itertools.islice(walker, count)
+        )
+
     def _get_todo_list(self) -> str:
         """Get TODO.md contents."""
         try:
@@ -214,15 +359,19 @@ class MCPServer:
         marker = priority_markers.get(priority, "🟡")
 
         try:
-            content = ""
-            if self.todo_file.exists():
-                content = self.todo_file.read_text(encoding='utf-8')
-
-            if not content.strip():
-                content = "# TODO\n\n"
-
-            content += f"- [ ] {marker} {item}\n"
-            self.todo_file.write_text(content, encoding='utf-8')
+            # Requests may be handled concurrently; serialize edits to the file
+            with self._todo_lock:
+                # Append just the new line rather than rewriting the file
+                line = f"- [ ] {marker} {item}\n".encode('utf-8')
+                with open(self.todo_file, 'a+b') as f:
+                    if f.seek(0, os.SEEK_END) == 0:
+                        line = b"# TODO\n\n" + line
+                    else:
+                        # Don't run the new item onto a last line with no newline
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) not in (b"\n", b"\r"):
+                            line = b"\n" + line
+                    f.write(line)
 
             return f"Added: {item} ({priority} priority)"
         except Exception as e:
@@ -234,7 +383,9 @@ class MCPServer:
         try:
             file_path = Path(path)
             if file_path.exists():
-                return file_path.read_text(encoding='utf-8')[:2000]
+                # Only read the part we return, not the whole file
+                with open(file_path, encoding='utf-8') as f:
+                    return f.read(2000)
             return f"File not found: {path}"
         except Exception as e:
             return f"Error: {e}"
@@ -257,22 +408,175 @@ class MCPServer:
 
     def run(self):
         """Run server reading from stdin."""
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        """
+        Read requests from stdin and handle them concurrently.
+
+        Each request is dispatched as its own task, so a pipelined client
+        doesn't wait for a slow request before the next one starts.
+        Responses are written as they complete and matched by id.
+        JSON-RPC batches (arrays of requests) get a single array response.
+
+        Messages may be newline-delimited JSON or LSP-style
+        "Content-Length: N" framed; replies use the same framing.
+        """
         print("MCP Server started", file=sys.stderr)
 
-        for line in sys.stdin:
-            line = line.strip()
-            if not line:
+        reader = await self._open_stdin()
+        pending: set[asyncio.Task] = set()
+
+        while True:
+            message = await self._read_message(reader)
+            if message is None:
+                break
+            body, framed = message
+            if body is None:
+                self._write_message(self._error_response(
+                    None, -32600, f"Invalid Request: message exceeds {MAX_MESSAGE_BYTES} bytes"
+                ), framed)
+                continue
+            if not body:
                 continue
 
             try:
-                request = json.loads(line)
-                response = self.handle_request(request)
-                print(json.dumps(response))
-                sys.stdout.flush()
+                request = _decode(body)
             except json.JSONDecodeError as e:
-                error = self._error_response(None, -32700, f"Parse error: {e}")
-                print(json.dumps(error))
-                sys.stdout.flush()
+                self._write_message(self._error_response(None, -32700, f"Parse error: {e}"), framed)
+                continue
+
+            if isinstance(request, list):
+                task = asyncio.create_task(self._dispatch_batch(request, framed))
+            else:
+                task = asyncio.create_task(self._dispatch(request, framed))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _read_message(self, reader: asyncio.StreamReader) -> Optional[tuple[Optional[bytes], bool]]:
+        """
+        Read one message body from stdin.
+
+        Returns (body, framed), or None at end of input. A framed message's
+        body is read in one call instead of being scanned for a newline.
+        The body is None for a message over MAX_MESSAGE_BYTES, which is
+        discarded so the next message can still be read.
+        """
+        line = await self._readline(reader)
+        if line is None:
+            return None, False
+        if not line:
+            return None
+
+        if not line[:len(_CONTENT_LENGTH)].lower() == _CONTENT_LENGTH:
+            return line.strip(), False
+
+        try:
+            length = int(line[len(_CONTENT_LENGTH):])
+        except ValueError:
+            return b"", True
+
+        # Skip any remaining headers up to the blank separator line
+        while True:
+            header = await self._readline(reader)
+            if header is not None and not header.strip():
+                break
+
+        if length < 0:
+            return b"", True
+        if length > MAX_MESSAGE_BYTES:
+            # Drain the body in chunks rather than buffering all of it
+            while length > 0:
+                chunk = await reader.read(min(length, 64 * 1024))
+                if not chunk:
+                    return None
+                length -= len(chunk)
+            return None, True
+
+        try:
+            return await reader.readexactly(length), True
+        except asyncio.IncompleteReadError:
+            return None
+
+    async def _readline(self, reader: asyncio.StreamReader) -> Optional[bytes]:
+        """
+        Read one line, or return None after discarding a line longer than
+        the reader's limit (StreamReader.readline would raise instead).
+
+        Returns b"" at end of input.
+        """
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            return e.partial  # last line without a newline, or b"" at EOF
+        except asyncio.LimitOverrunError as e:
+            overrun = e
+
+        # Drop buffered data up to the newline, however many reads it takes
+        while True:
+            try:
+                await reader.readexactly(overrun.consumed)
+                await reader.readuntil(b"\n")
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as e:
+                overrun = e
+
+    async def _dispatch(self, request: dict, framed: bool = False) -> None:
+        """Handle one request and write its response."""
+        response = await self.handle_request_async(request)
+        self._write_message(response, framed)
+
+    async def _dispatch_batch(self, batch: list, framed: bool = False) -> None:
+        """
+        Handle a JSON-RPC batch and write the responses as one array.
+
+        All requests in the batch run concurrently, so e.g. several
+        read_file calls overlap their disk reads.
+        """
+        if not batch:
+            self._write_message(self._error_response(None, -32600, "Invalid Request"), framed)
+            return
+
+        responses = await asyncio.gather(*(self.handle_request_async(r) for r in batch))
+        self._write_message(list(responses), framed)
+
+    async def _open_stdin(self) -> asyncio.StreamReader:
+        """Connect an asyncio stream reader to stdin."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+
+        try:
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+            )
+        except (ValueError, OSError, NotImplementedError):
+            # Regular files (and Windows consoles) can't be watched by the
+            # event loop - feed the reader from a background thread instead
+            threading.Thread(
+                target=self._feed_stdin, args=(loop, reader), daemon=True
+            ).start()
+
+        return reader
+
+    def _feed_stdin(self, loop: asyncio.AbstractEventLoop, reader: asyncio.StreamReader) -> None:
+        """Copy stdin lines into the reader (fallback path)."""
+        for line in sys.stdin.buffer:
+            loop.call_soon_threadsafe(reader.feed_data, line)
+        loop.call_soon_threadsafe(reader.feed_eof)
+
+    def _write_message(self, message: dict | list, framed: bool = False) -> None:
+        """Write one JSON-RPC message to stdout."""
+        body = _encode(message)
+        if framed:
+            sys.stdout.buffer.write(b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+        else:
+            sys.stdout.buffer.write(body + b"\n")
+        sys.stdout.buffer.flush()
 
 
 def main():
@@ -4,9 +4,18 @@ Editor Context Tool
 Lab 10: Capture editor state (active file, selection, cursor).
 """
 
-from dataclasses import dataclass
+import os
+from collections import deque
+from dataclasses import dataclass, replace
+from types import MappingProxyType
 from typing import Optional
 
+# File extension -> editor language
+_LANG_MAP = MappingProxyType({
+    'py': 'python', 'js': 'javascript', 'ts': 'typescript',
+    'rs': 'rust', 'go': 'go', 'java': 'java', 'cpp': 'cpp', 'c': 'c'
+})
+
 
 @dataclass
 class EditorState:
@@ -29,9 +38,9 @@ class EditorContext:
     - What language/mode
     """
 
-    def __init__(self):
+    def __init__(self, max_history: int = 100):
         self._state = EditorState()
-        self._history: list[EditorState] = []
+        self._history: deque[EditorState] = deque(maxlen=max_history)
 
     def set_active_file(self, file_path: str, language: str = None) -> None:
         """Set the currently active file."""
@@ -39,9 +48,8 @@ class EditorContext:
         if language:
             self._state.language = language
         elif file_path:
-            ext = file_path.rsplit('.', 1)[-1] if '.' in file_path else ''
-            lang_map = {'py': 'python', 'js': 'javascript', 'ts': 'typescript'}
-            self._state.language = lang_map.get(ext, ext)
+            ext = os.path.splitext(file_path)[1][1:].lower()
+            self._state.language = _LANG_MAP.get(ext, ext)
 
     def set_selection(self, text: str) -> None:
         """Set the current selection."""
@@ -75,5 +83,5 @@ class EditorContext:
 
     def snapshot(self) -> None:
         """Save current state to history."""
-        import copy
-        self._history.append(copy.deepcopy(self._state))
+        # EditorState only holds immutable fields, so a shallow copy is enough
+        self._history.append(replace(self._state))
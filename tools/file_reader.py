@@ -4,6 +4,7 @@ File Reader Tool
 Lab 10: Read-only file access for the MCP system.
 """
 
+import codecs
 import os
 from pathlib import Path
 from typing import Optional
@@ -16,8 +17,9 @@ class FileContent:
     path: str
     content: str
     lines: int
-    size: int
+    size: int  # bytes on disk, not characters of content
     extension: str
+    truncated: bool = False
 
 
 class FileReader:
@@ -29,13 +31,19 @@ class FileReader:
     """
 
     ALLOWED_EXTENSIONS = {'.py', '.js', '.ts', '.json', '.md', '.txt', '.yaml', '.yml', '.toml'}
+    MAX_READ_BYTES = 1024 * 1024
 
     def __init__(self, base_path: str = "."):
         self.base_path = Path(base_path).resolve()
         self._read_history: list[str] = []
 
-    def read(self, file_path: str) -> Optional[FileContent]:
-        """Read a file and return its content."""
+    def read(self, file_path: str, max_bytes: Optional[int] = None) -> Optional[FileContent]:
+        """
+        Read a file and return its content.
+
+        Only the first max_bytes (default MAX_READ_BYTES) are loaded;
+        lines and size always describe the whole file.
+        """
         path = Path(file_path)
 
         # Security: resolve to absolute and check if within base
@@ -48,21 +56,50 @@ class FileReader:
         if abs_path.suffix.lower() not in self.ALLOWED_EXTENSIONS:
             return None
 
+        limit = self.MAX_READ_BYTES if max_bytes is None else max_bytes
+
         # Read file
         try:
-            content = abs_path.read_text(encoding='utf-8')
+            with open(abs_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                data = f.read(limit)
+                lines = self._count_lines(f, data, size)
+
+            # Incremental decode tolerates a multi-byte character cut at the limit
+            content = codecs.getincrementaldecoder('utf-8')().decode(data, final=size <= limit)
             self._read_history.append(str(abs_path))
 
             return FileContent(
                 path=str(abs_path),
                 content=content,
-                lines=len(content.splitlines()),
-                size=len(content),
-                extension=abs_path.suffix
+                lines=lines,
+                size=size,
+                extension=abs_path.suffix,
+                truncated=size > limit
             )
         except:
             return None
 
+    @staticmethod
+    def _count_lines(f, data: bytes, size: int) -> int:
+        """
+        Count lines, matching str.splitlines() for \\n files.
+
+        data is the start of the file, already read; only a file larger
+        than that is read on, in fixed-size chunks.
+        """
+        if size == 0:
+            return 0
+
+        newlines = data.count(b'\n')
+        chunk = data
+        if size > len(data):
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                newlines += chunk.count(b'\n')
+
+        # A final line without a trailing newline still counts
+        return newlines + (not chunk.endswith(b'\n'))
+
     def list_files(self, directory: str = ".", pattern: str = "*") -> list[str]:
         """List files in a directory."""
         path = Path(directory)
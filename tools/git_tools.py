@@ -4,12 +4,90 @@ Git Tools
 Lab 12: Git operations for MCP integration.
 """
 
+import codecs
+import fnmatch
+import itertools
+import logging
+import os
+import re
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+try:
+    import pygit2
+except ImportError:  # optional - fall back to the git CLI
+    pygit2 = None
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# Working-tree edits don't touch .git/index, so a cached status is only
+# reused for this many seconds even when the repository state is unchanged
+STATUS_CACHE_TTL = 2.0
+
+# File mtimes come from the kernel's coarse clock and can trail time.time_ns(),
+# so is_probably_clean() treats anything modified up to this long before the
+# last clean status query started as changed (like git's "racy" index entries)
+CLEAN_MTIME_SLACK = 1.0
+
+# How long "is this a repository?" is trusted before .git is looked up again
+REPO_CHECK_TTL = 60.0
+
+# get_diff() stops reading git's output after this many bytes
+DIFF_MAX_BYTES = 2048
+
+# get_diff() lists, rather than inlines, files with more changed lines than this
+DIFF_LARGE_FILE_LINES = 500
+
+# Read-only queries never need git's optional index lock, a credential
+# prompt or a pager
+_GIT_ENV = {
+    **os.environ,
+    "GIT_OPTIONAL_LOCKS": "0",
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_PAGER": "cat",
+}
+
+# Don't allocate a console window for each git process on Windows
+_CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+# Commit fields and records are NUL-separated so no subject can break parsing
+_LOG_FORMAT = "--format=%H%x00%s%x00%an%x00%ad"
+
+# get_snapshot() runs status and log from one shell, separated by a marker
+# that can't occur in porcelain -z or NUL-delimited log output (it would
+# need two empty fields in a row). The marker is only printed if status
+# succeeded, so a missing marker means the status output can't be trusted.
+_SNAPSHOT_SEP = b"\0\0---\0\0"
+_SNAPSHOT_SCRIPT = (
+    "git status --porcelain=v2 --branch -z || exit 1; printf '\\0\\0---\\0\\0'; "
+    f"git log -z -\"$1\" '{_LOG_FORMAT}' --date=short"
+)
+
+
+def _decode_truncated(data: bytes) -> str:
+    """Decode UTF-8 output that may have been cut mid-character."""
+    return codecs.getincrementaldecoder("utf-8")(errors="replace").decode(data)
+
+
+def _subject(message: str) -> str:
+    """Get a commit's subject the way `git log --format=%s` prints it."""
+    # The subject is the first paragraph, its lines joined with spaces
+    lines = []
+    for line in message.splitlines():
+        line = line.rstrip()
+        if line:
+            lines.append(line)
+        elif lines:
+            break
+    return " ".join(lines)
+
+
+@dataclass(slots=True)
 class GitStatus:
     """Git repository status."""
     branch: str
@@ -20,21 +98,28 @@ class GitStatus:
 
     def to_context_string(self) -> str:
         """Convert to context string."""
-        lines = [
+        sections = (
+            ("Staged", self.staged),
+            ("Modified", self.modified),
+            ("Untracked", self.untracked),
+        )
+        return "\n".join([
             "[GIT STATUS]",
             f"Branch: {self.branch}",
-            f"Clean: {self.clean}"
-        ]
-        if self.staged:
-            lines.append(f"Staged: {', '.join(self.staged[:5])}")
-        if self.modified:
-            lines.append(f"Modified: {', '.join(self.modified[:5])}")
-        if self.untracked:
-            lines.append(f"Untracked: {', '.join(self.untracked[:5])}")
-        return "\n".join(lines)
+            f"Clean: {self.clean}",
+            *[f"{label}: {', '.join(paths[:5])}" for label, paths in sections if paths]
+        ])
+
 
+def _copy_status(status: GitStatus) -> GitStatus:
+    """Copy a status, so a caller editing its lists can't change the cached one."""
+    return GitStatus(
+        status.branch, status.clean,
+        list(status.staged), list(status.modified), list(status.untracked)
+    )
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class GitCommit:
     """A git commit."""
     hash: str
@@ -48,93 +133,630 @@ class GitTools:
     Git operations for MCP.
 
     Provides read-only git information.
+
+    When pygit2 is installed, a single libgit2 repository handle is kept
+    open for the lifetime of the object so status and log queries don't
+    fork a git process per call; otherwise the git CLI is used.
     """
 
+    # Shared by all instances; get_all() runs its three queries on it
+    _executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="git-tools")
+
     def __init__(self, repo_path: str = "."):
         self.repo_path = repo_path
+        self._repo = self._open_repo()
+        self._repo_lock = threading.Lock()
+        self._locate_repo()
+        self._status_cache: Optional[tuple[tuple, float, GitStatus]] = None
+        # (status key, wall-clock ns when the query started, less
+        # CLEAN_MTIME_SLACK) of the last clean status
+        self._clean_since: Optional[tuple[tuple, int]] = None
+        self._commits_cache: Optional[tuple[tuple, int, list[GitCommit]]] = None
 
-    def get_status(self) -> Optional[GitStatus]:
-        """Get repository status."""
-        try:
-            # Get branch
-            branch_result = subprocess.run(
-                ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-                capture_output=True, text=True, cwd=self.repo_path, timeout=5
-            )
-            branch = branch_result.stdout.strip() or "unknown"
+    def refresh(self) -> None:
+        """Look for the repository again and drop all cached results."""
+        with self._repo_lock:
+            self._repo = self._open_repo()
+        self._locate_repo()
+        self._status_cache = None
+        self._clean_since = None
+        self._commits_cache = None
 
-            # Get status
-            status_result = subprocess.run(
-                ["git", "status", "--porcelain"],
-                capture_output=True, text=True, cwd=self.repo_path, timeout=5
-            )
+    def _in_repo(self) -> bool:
+        """
+        Check whether repo_path is inside a git repository.
 
-            staged = []
-            modified = []
-            untracked = []
-
-            for line in status_result.stdout.splitlines():
-                if not line:
-                    continue
-                status = line[:2]
-                filename = line[3:]
-
-                if status[0] in ['A', 'M', 'D', 'R']:
-                    staged.append(filename)
-                if status[1] == 'M':
-                    modified.append(filename)
-                if status == '??':
-                    untracked.append(filename)
-
-            return GitStatus(
-                branch=branch,
-                clean=not (staged or modified or untracked),
-                staged=staged,
-                modified=modified,
-                untracked=untracked
-            )
+        The answer from the last lookup is reused for REPO_CHECK_TTL
+        seconds, so outside a repository no git process is started.
+        """
+        if time.monotonic() - self._repo_checked_at > REPO_CHECK_TTL:
+            self._locate_repo()
+        return self._git_dir is not None
+
+    def _locate_repo(self) -> None:
+        """Find the git dir, the common dir holding shared refs, and the work tree."""
+        self._git_dir, self._work_tree = self._find_git_dir()
+        self._common_dir = self._git_dir
+        if self._git_dir:
+            # Linked worktrees keep their own HEAD and index, but branch
+            # refs and packed-refs live in the main repository's git dir
+            try:
+                with open(os.path.join(self._git_dir, "commondir"), encoding="utf-8") as f:
+                    self._common_dir = os.path.normpath(
+                        os.path.join(self._git_dir, f.readline().strip())
+                    )
+            except OSError:
+                pass
+        self._repo_checked_at = time.monotonic()
+
+    def _find_git_dir(self) -> tuple[Optional[str], Optional[str]]:
+        """
+        Locate the git directory and work tree for repo_path.
+
+        Searches upward from repo_path like git does, following the
+        gitdir file used by worktrees and submodules.
+        """
+        path = os.path.abspath(self.repo_path)
+        while True:
+            dot_git = os.path.join(path, ".git")
+            if os.path.isdir(dot_git):
+                return dot_git, path
+            try:
+                with open(dot_git, encoding="utf-8") as f:
+                    line = f.readline().strip()
+            except OSError:
+                line = ""
+            if line.startswith("gitdir:"):
+                return os.path.join(path, line[len("gitdir:"):].strip()), path
+
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None, None
+            path = parent
+
+    def _stat_key(self, *paths: str) -> tuple:
+        """(mtime_ns, size) for each path, None for missing files."""
+        key = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                key.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                key.append(None)
+        return tuple(key)
 
-        except Exception:
+    def _head_paths(self) -> list[str]:
+        """Files whose changes mean HEAD may point somewhere new."""
+        head = os.path.join(self._git_dir, "HEAD")
+        paths = [head, os.path.join(self._common_dir, "packed-refs")]
+        try:
+            with open(head, encoding="utf-8") as f:
+                ref = f.readline().strip()
+        except OSError:
+            return paths
+        if ref.startswith("ref:"):
+            paths.append(os.path.join(self._common_dir, ref[len("ref:"):].strip()))
+        return paths
+
+    def get_status(self) -> Optional[GitStatus]:
+        """
+        Get repository status.
+
+        Repeat calls are served from a cache keyed on the index and HEAD
+        file stats, for up to STATUS_CACHE_TTL seconds.
+        """
+        if not self._in_repo():
             return None
 
+        key = self._status_key()
+        cached = self._status_cache
+        if key and cached and cached[0] == key and time.monotonic() - cached[1] < STATUS_CACHE_TTL:
+            return _copy_status(cached[2])
+
+        started_ns = time.time_ns()
+        status = self._read_status()
+        if status is None:
+            # A failed query says nothing about the tree; don't let an
+            # older clean result keep vouching for it
+            self._clean_since = None
+        elif key:
+            self._remember_status(key, status, started_ns)
+            return _copy_status(status)
+        return status
+
+    def _remember_status(self, key: tuple, status: GitStatus, started_ns: int) -> None:
+        """
+        Cache a freshly read status, noting when a clean one was taken.
+
+        Only call this with a status from a git query that succeeded.
+        """
+        self._status_cache = (key, time.monotonic(), status)
+        if status.clean:
+            self._clean_since = (key, started_ns - int(CLEAN_MTIME_SLACK * 1e9))
+        else:
+            self._clean_since = None
+
     def get_recent_commits(self, count: int = 10) -> list[GitCommit]:
-        """Get recent commits."""
+        """
+        Get recent commits.
+
+        Cached until HEAD or the current branch ref changes.
+        """
+        if not self._in_repo():
+            return []
+
+        key = self._commits_key()
+        cached = self._commits_cache
+        if key and cached and cached[0] == key and cached[1] == count:
+            return list(cached[2])
+
+        commits = self._read_commits(count)
+        if key and commits:
+            self._commits_cache = (key, count, commits)
+        return list(commits)
+
+    def get_snapshot(self, commit_count: int = 10) -> dict:
+        """
+        Get status, recent commits and diff together.
+
+        Cached status and commits are reused. Otherwise, with the git CLI
+        on POSIX, status and log come from a single shell running both git
+        commands back to back, rather than one process per query. The diff
+        always comes from get_diff(), so it has the same shape either way.
+        """
+        status_key = self._status_key()
+        commits_key = self._commits_key()
+        cached_status = self._status_cache
+        cached_commits = self._commits_cache
+        fresh = (
+            status_key and cached_status and cached_status[0] == status_key
+            and time.monotonic() - cached_status[1] < STATUS_CACHE_TTL
+            and commits_key and cached_commits and cached_commits[0] == commits_key
+            and cached_commits[1] == commit_count
+        )
+        if fresh or self._repo is not None or os.name != "posix" or not self._in_repo():
+            return {
+                "status": self.get_status(),
+                "commits": self.get_recent_commits(commit_count),
+                "diff": self.get_diff(),
+            }
+
+        started_ns = time.time_ns()
         try:
             result = subprocess.run(
-                ["git", "log", f"-{count}", "--format=%H|%s|%an|%ad", "--date=short"],
-                capture_output=True, text=True, cwd=self.repo_path, timeout=5
+                ["sh", "-c", _SNAPSHOT_SCRIPT, "sh", str(commit_count)],
+                capture_output=True, cwd=self.repo_path, timeout=10, env=_GIT_ENV
             )
+            sections = result.stdout.split(_SNAPSHOT_SEP, 1)
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.debug("git snapshot failed in %s: %s", self.repo_path, e)
+            sections = []
+
+        if len(sections) != 2:
+            if sections:
+                logger.debug("git status failed in %s: %s", self.repo_path,
+                             result.stderr.decode(errors="replace").strip())
+            self._clean_since = None
+            return {"status": None, "commits": [], "diff": self.get_diff()}
+
+        status = self._parse_status(sections[0])
+        commits = self._parse_commits(sections[1])
+        self._remember_status(status_key, status, started_ns)
+        if commits:
+            self._commits_cache = (commits_key, commit_count, commits)
+        return {
+            "status": _copy_status(status),
+            "commits": list(commits),
+            "diff": self.get_diff(),
+        }
+
+    def get_all(self, commit_count: int = 10) -> tuple[Optional[GitStatus], list[GitCommit], str]:
+        """
+        Get status, recent commits and diff concurrently.
+
+        The queries are independent and spend their time waiting on git,
+        so the total wait is roughly the slowest of the three.
+        """
+        status = self._executor.submit(self.get_status)
+        commits = self._executor.submit(self.get_recent_commits, commit_count)
+        diff = self._executor.submit(self.get_diff)
+        return status.result(), commits.result(), diff.result()
+
+    def get_branch_fast(self) -> Optional[str]:
+        """
+        Get the current branch by reading HEAD directly, without running git.
+
+        Returns "HEAD" when detached and None outside a repository.
+        """
+        if not self._in_repo():
+            return None
+        try:
+            with open(os.path.join(self._git_dir, "HEAD"), encoding="utf-8") as f:
+                head = f.readline().strip()
+        except OSError:
+            return None
+        _, sep, branch = head.partition("ref: refs/heads/")
+        return branch if sep else "HEAD"
+
+    def is_probably_clean(self) -> bool:
+        """
+        Guess whether the working tree is still clean, without running git.
+
+        True only when the last get_status() found the tree clean, the
+        index and HEAD are unchanged since, and an os.scandir walk finds
+        nothing modified after that query started (less CLEAN_MTIME_SLACK).
+        Names matching the top-level .gitignore are pruned from the walk.
+        False means "maybe dirty" - call get_status() for the accurate
+        answer; when the walk finds a newer file the cached status is
+        dropped, so that call queries git again.
+        """
+        clean_since = self._clean_since
+        if not clean_since or clean_since[0] != self._status_key():
+            return False
+        if self._modified_since(clean_since[1]):
+            self._status_cache = None
+            self._clean_since = None
+            return False
+        return True
+
+    def _modified_since(self, since_ns: int) -> bool:
+        """Walk the work tree for anything with an mtime after since_ns."""
+        try:
+            if os.stat(self._work_tree).st_mtime_ns > since_ns:
+                return True
+        except OSError:
+            return True
+
+        ignored = self._ignore_matcher()
+        stack = [self._work_tree]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.name == ".git" or (ignored and ignored(entry.name)):
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if st.st_mtime_ns > since_ns:
+                        return True
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+        return False
+
+    def _ignore_matcher(self):
+        """Match names against the slash-free patterns in the top-level .gitignore."""
+        try:
+            with open(os.path.join(self._work_tree, ".gitignore"), encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+
+        patterns = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(("#", "!")):
+                continue
+            name = line.strip("/")
+            if "/" not in name:
+                patterns.append(fnmatch.translate(name))
+        if not patterns:
+            return None
+        return re.compile("|".join(patterns)).match
+
+    def _status_key(self) -> Optional[tuple]:
+        """Cache key for get_status(): index and HEAD file stats."""
+        if not self._git_dir:
+            return None
+        return self._stat_key(os.path.join(self._git_dir, "index"), *self._head_paths())
+
+    def _commits_key(self) -> Optional[tuple]:
+        """Cache key for get_recent_commits(): HEAD file stats."""
+        if not self._git_dir:
+            return None
+        return self._stat_key(*self._head_paths())
+
+    def _git(self, *args: str, text: bool = False, timeout: float = 5) -> subprocess.CompletedProcess:
+        """Run a read-only git command in the repository."""
+        return subprocess.run(
+            ["git", "--no-optional-locks", *args],
+            capture_output=True, text=text, cwd=self.repo_path, timeout=timeout,
+            env=_GIT_ENV, creationflags=_CREATION_FLAGS
+        )
+
+    def _open_repo(self) -> Optional["pygit2.Repository"]:
+        """Open a long-lived libgit2 handle, if available."""
+        if pygit2 is None:
+            return None
+        try:
+            return pygit2.Repository(self.repo_path)
+        except pygit2.GitError:
+            return None
+
+    def _read_status(self) -> Optional[GitStatus]:
+        """Query repository status from libgit2 or the git CLI."""
+        if self._repo is not None:
+            try:
+                with self._repo_lock:
+                    status = self._status_from_repo()
+                if status is not None:
+                    return status
+            except pygit2.GitError:
+                pass  # fall back to the git CLI
+
+        try:
+            # Branch and status in one process, NUL-delimited so any
+            # filename (even one containing a newline) splits cleanly
+            result = self._git("status", "--porcelain=v2", "--branch", "-z")
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.debug("git status failed in %s: %s", self.repo_path, e)
+            return None
+
+        # Empty output from a failed run would otherwise parse as a clean tree
+        if result.returncode != 0:
+            logger.debug("git status failed in %s: %s", self.repo_path,
+                         result.stderr.decode(errors="replace").strip())
+            return None
+
+        return self._parse_status(result.stdout)
+
+    @staticmethod
+    def _parse_status(output: bytes) -> GitStatus:
+        """Parse `git status --porcelain=v2 --branch -z` output."""
+        records = output.split(b'\0')
+
+        # Branch headers come before any entries
+        branch = "unknown"
+        n_headers = 0
+        for record in records:
+            if record[:2] != b'# ':
+                break
+            if record.startswith(b'# branch.head '):
+                head = os.fsdecode(record[len(b'# branch.head '):])
+                branch = "HEAD" if head == "(detached)" else head
+            n_headers += 1
+
+        # Clean tree: nothing follows the headers but the trailing empty record
+        if n_headers >= len(records) - 1:
+            return GitStatus(branch=branch, clean=True, staged=[], modified=[], untracked=[])
+
+        staged = []
+        modified = []
+        untracked = []
+
+        entries = iter(records[n_headers:])
+        for record in entries:
+            kind = record[:2]
+            if kind == b'1 ':
+                # 1 XY sub mH mI mW hH hI path
+                xy, path = record[2:4], record.split(b' ', 8)[8]
+            elif kind == b'2 ':
+                # 2 XY sub mH mI mW hH hI Xscore path, then NUL origPath
+                xy, path = record[2:4], record.split(b' ', 9)[9]
+                next(entries, None)
+            elif kind == b'? ':
+                untracked.append(os.fsdecode(record[2:]))
+                continue
+            else:
+                continue  # ignored/unmerged entries and the trailing empty record
+
+            filename = os.fsdecode(path)
+            if xy[:1] in (b'A', b'M', b'D', b'R'):
+                staged.append(filename)
+            if xy[1:] == b'M':
+                modified.append(filename)
+
+        return GitStatus(
+            branch=branch,
+            clean=not (staged or modified or untracked),
+            staged=staged,
+            modified=modified,
+            untracked=untracked
+        )
+
+    def _status_from_repo(self) -> Optional[GitStatus]:
+        """
+        Build a GitStatus from the libgit2 handle.
+
+        Returns None when the index may hold a rename. libgit2's status
+        doesn't pair the old and new paths the way `git status` does, so
+        the git CLI answers those cases instead.
+        """
+        repo = self._repo
+        if repo.head_is_unborn:
+            # No commits yet, but HEAD already names the branch to be born
+            target = repo.lookup_reference("HEAD").target
+            branch = target[len("refs/heads/"):] if target.startswith("refs/heads/") else "unknown"
+        elif repo.head_is_detached:
+            branch = "HEAD"
+        else:
+            branch = repo.head.shorthand
+
+        staged_flags = (
+            pygit2.GIT_STATUS_INDEX_NEW | pygit2.GIT_STATUS_INDEX_MODIFIED
+            | pygit2.GIT_STATUS_INDEX_DELETED | pygit2.GIT_STATUS_INDEX_RENAMED
+        )
+        staged = []
+        modified = []
+        untracked = []
 
-            commits = []
-            for line in result.stdout.splitlines():
-                if not line:
-                    continue
-                parts = line.split("|", 3)
-                if len(parts) >= 4:
-                    commits.append(GitCommit(
-                        hash=parts[0][:8],
-                        message=parts[1][:50],
-                        author=parts[2],
-                        date=parts[3]
-                    ))
-
-            return commits
-
-        except Exception:
+        # "normal" lists an untracked directory once, as `dir/`, like the CLI
+        entries = sorted(repo.status(untracked_files="normal").items())
+        index_new = index_deleted = False
+        for _, flags in entries:
+            index_new = index_new or bool(flags & pygit2.GIT_STATUS_INDEX_NEW)
+            index_deleted = index_deleted or bool(flags & pygit2.GIT_STATUS_INDEX_DELETED)
+        if index_new and index_deleted:
+            return None
+
+        for path, flags in entries:
+            if flags & staged_flags:
+                staged.append(path)
+            if flags & pygit2.GIT_STATUS_WT_MODIFIED:
+                modified.append(path)
+            if flags & pygit2.GIT_STATUS_WT_NEW:
+                untracked.append(path)
+
+        return GitStatus(
+            branch=branch,
+            clean=not (staged or modified or untracked),
+            staged=staged,
+            modified=modified,
+            untracked=untracked
+        )
+
+    def _read_commits(self, count: int) -> list[GitCommit]:
+        """Query recent commits from libgit2 or the git CLI."""
+        if self._repo is not None:
+            try:
+                with self._repo_lock:
+                    return self._commits_from_repo(count)
+            except pygit2.GitError:
+                pass  # fall back to the git CLI
+
+        try:
+            result = self._git("log", "-z", f"-{count}", _LOG_FORMAT, "--date=short")
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.debug("git log failed in %s: %s", self.repo_path, e)
             return []
 
-    def get_diff(self, staged: bool = False) -> str:
-        """Get diff."""
+        return self._parse_commits(result.stdout)
+
+    @staticmethod
+    def _parse_commits(output: bytes) -> list[GitCommit]:
+        """Parse `git log -z` output written with _LOG_FORMAT."""
+        fields = output.decode("utf-8", errors="replace").split("\0")
+        # Group the flat field list into (hash, subject, author, date);
+        # zip drops the empty string left by the trailing NUL
+        return [
+            GitCommit(commit_hash[:8], subject[:50], author, date)
+            for commit_hash, subject, author, date in zip(*[iter(fields)] * 4)
+        ]
+
+    def _commits_from_repo(self, count: int) -> list[GitCommit]:
+        """Read recent commits from the libgit2 handle."""
+        repo = self._repo
+        if repo.head_is_unborn:
+            return []
+
+        commits = []
+        for commit in itertools.islice(repo.walk(repo.head.target, pygit2.GIT_SORT_TIME), count):
+            author = commit.author
+            # Match `git log --date=short`: author date in the author's timezone
+            date = datetime.fromtimestamp(author.time, timezone(timedelta(minutes=author.offset)))
+            commits.append(GitCommit(
+                hash=str(commit.id)[:8],
+                message=_subject(commit.message)[:50],
+                author=author.name,
+                date=date.strftime("%Y-%m-%d")
+            ))
+
+        return commits
+
+    def _git_head(self, *args: str, limit: int, timeout: float = 10) -> bytes:
+        """
+        Run a read-only git command, keeping only the first `limit` bytes.
+
+        The pipe is closed once enough has been read, so git stops with
+        SIGPIPE instead of producing output that would be thrown away.
+        Raises subprocess.TimeoutExpired if git runs longer than `timeout`.
+        """
+        cmd = ["git", "--no-optional-locks", *args]
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=self.repo_path,
+            env=_GIT_ENV, creationflags=_CREATION_FLAGS
+        )
+        # A git that stalls would block the read, so kill it at the deadline
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
         try:
-            cmd = ["git", "diff"]
+            data = proc.stdout.read(limit)
+        finally:
+            proc.stdout.close()
+            timer.cancel()
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if expired.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return data
+
+    def _oversized_files(self, diff_args: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Find binary and very large files in a diff using `--numstat`.
+
+        Returns:
+            (one note per skipped file, pathspecs that exclude them)
+        """
+        result = self._git(*diff_args, "--numstat", "-z")
+        notes = []
+        excludes = []
+
+        records = iter(result.stdout.split(b'\0'))
+        for record in records:
+            if not record:
+                continue
+            added, deleted, path = record.split(b'\t', 2)
+            paths = [path]
+            if not path:
+                # Renames: the source and destination follow as separate records
+                paths = [next(records, b''), next(records, b'')]
+
+            if added == b'-':
+                reason = "binary"
+            elif int(added) + int(deleted) > DIFF_LARGE_FILE_LINES:
+                reason = f"+{int(added)} -{int(deleted)} lines"
+            else:
+                continue
+
+            names = [os.fsdecode(p) for p in paths]
+            notes.append(f"Skipped {' => '.join(names)} ({reason})\n")
+            excludes.extend(f":(top,exclude,literal){name}" for name in names)
+
+        return notes, excludes
+
+    def get_diff(self, staged: bool = False, summary: bool = False) -> str:
+        """
+        Get diff.
+
+        Binary files and files with more than DIFF_LARGE_FILE_LINES changed
+        lines are listed by name instead of being included in the patch.
+
+        Args:
+            staged: Diff the index against HEAD instead of the working tree
+            summary: Return a `--stat` summary instead of the patch
+        """
+        if not self._in_repo():
+            return ""
+
+        try:
+            args = ["diff", "--no-color", "--no-ext-diff"]
             if staged:
-                cmd.append("--staged")
+                args.append("--staged")
+            if summary:
+                args.append("--stat=80")
+                return _decode_truncated(self._git_head(*args, limit=DIFF_MAX_BYTES))
 
-            result = subprocess.run(
-                cmd, capture_output=True, text=True,
-                cwd=self.repo_path, timeout=10
-            )
-            return result.stdout[:2000]
+            notes, excludes = self._oversized_files(args)
+            data = "".join(notes).encode()[:DIFF_MAX_BYTES]
+            if len(data) < DIFF_MAX_BYTES:
+                if excludes:
+                    args += ["--", *excludes]
+                data += self._git_head(*args, limit=DIFF_MAX_BYTES - len(data))
+            return _decode_truncated(data)
 
-        except Exception:
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.debug("git diff failed in %s: %s", self.repo_path, e)
             return ""
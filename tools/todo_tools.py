@@ -4,13 +4,71 @@ Todo Tools
 Lab 12: TODO.md management for MCP integration.
 """
 
-from pathlib import Path
-from dataclasses import dataclass
-from typing import Optional
+import copy
+import logging
+import os
 import re
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Single-codepoint emoji written in front of an item's text
+_PRIORITY_MARKERS = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+_MARKER_TO_PRIORITY = {marker: priority for priority, marker in _PRIORITY_MARKERS.items()}
+
+# Inline priority tags, matched case-insensitively
+PRIORITY_TOKENS = (("[high]", "high"), ("[low]", "low"))
+_TAG_TO_PRIORITY = dict(PRIORITY_TOKENS)
+
+# Matches the tags on the original text; offsets found in text.lower() can
+# be wrong because lowercasing may change the length (e.g. 'İ' -> 'i̇')
+_TAG_RE = re.compile(
+    "(" + "|".join(re.escape(tag) for tag, _ in PRIORITY_TOKENS) + ")",
+    re.IGNORECASE | re.ASCII
+)
+
+# When an item carries several markers, the first of these wins
+_PRIORITY_ORDER = ("high", "low", "medium")
+
+# Deletes every priority emoji in one str.translate pass
+_STRIP_MARKERS = str.maketrans("", "", "".join(_MARKER_TO_PRIORITY))
 
 
-@dataclass
+def _split_priority(text: str) -> tuple[str, str]:
+    """Find an item's priority and cut its markers out of the text."""
+    # Markers lead the text, so only the first few characters are checked
+    found = {_MARKER_TO_PRIORITY[ch] for ch in text[:5] if ch in _MARKER_TO_PRIORITY}
+
+    if "[" in text:
+        # Splitting on the captured tags leaves text and tags interleaved
+        parts = _TAG_RE.split(text)
+        if len(parts) > 1:
+            found.update(_TAG_TO_PRIORITY[tag.lower()] for tag in parts[1::2])
+            text = "".join(parts[0::2])
+
+    priority = next((p for p in _PRIORITY_ORDER if p in found), "medium")
+    # Markers are removed wherever they appear, even past the detection window
+    return text.translate(_STRIP_MARKERS).strip(), priority
+
+
+def _lines_with_offsets(f: BinaryIO) -> Iterator[tuple[int, bytes]]:
+    """
+    Yield (byte offset, line) for each line of a binary file.
+
+    Lines end at \\n, \\r\\n or \\r, like text mode's universal newlines.
+    Iterating a binary file only splits on \\n, so chunks holding a bare
+    \\r are split again.
+    """
+    offset = 0
+    for chunk in f:
+        for line in chunk.splitlines(keepends=True) if b"\r" in chunk else (chunk,):
+            yield offset, line
+            offset += len(line)
+
+
+@dataclass(slots=True, frozen=True)
 class TodoItem:
     """A single todo item."""
     text: str
@@ -21,24 +79,22 @@ class TodoItem:
     def to_string(self) -> str:
         """Convert to markdown string."""
         checkbox = "[x]" if self.completed else "[ ]"
-        markers = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-        marker = markers.get(self.priority, "")
+        marker = _PRIORITY_MARKERS.get(self.priority, "")
         return f"- {checkbox} {marker} {self.text}"
 
 
-@dataclass
+@dataclass(slots=True)
 class TodoList:
     """Todo list from TODO.md."""
     items: list[TodoItem]
     file_path: str
+    # Counted once when the list is built rather than on every access
+    total: int = field(init=False)
+    completed: int = field(init=False)
 
-    @property
-    def total(self) -> int:
-        return len(self.items)
-
-    @property
-    def completed(self) -> int:
-        return sum(1 for i in self.items if i.completed)
+    def __post_init__(self):
+        self.total = len(self.items)
+        self.completed = sum(1 for i in self.items if i.completed)
 
     @property
     def pending(self) -> int:
@@ -46,15 +102,20 @@ class TodoList:
 
     def to_context_string(self) -> str:
         """Convert to context string."""
-        lines = [
+        return "\n".join([
             "[TODO LIST]",
             f"Total: {self.total} ({self.completed} done, {self.pending} pending)",
-            ""
-        ]
-        for item in self.items[:10]:
-            status = "✓" if item.completed else "○"
-            lines.append(f"  {status} {item.text[:50]}")
-        return "\n".join(lines)
+            "",
+            *[f"  {'✓' if item.completed else '○'} {item.text[:50]}" for item in self.items[:10]]
+        ])
+
+
+def _copy_list(todo_list: TodoList) -> TodoList:
+    """Copy a list, so a caller editing its items can't change the cached one."""
+    # copy.copy keeps the counts instead of running __post_init__ again
+    copied = copy.copy(todo_list)
+    copied.items = list(todo_list.items)
+    return copied
 
 
 class TodoTools:
@@ -66,6 +127,10 @@ class TodoTools:
 
     def __init__(self, todo_path: str = "TODO.md"):
         self.todo_path = Path(todo_path)
+        # ((mtime_ns, size), byte offset of each line start) from the last scan
+        self._line_index: Optional[tuple[tuple[int, int], list[int]]] = None
+        # ((mtime_ns, size), list) from the last read(), reused while unchanged
+        self._cache: Optional[tuple[tuple[int, int], TodoList]] = None
 
     def read(self) -> TodoList:
         """Read todo list from file."""
@@ -75,94 +140,131 @@ class TodoTools:
             return TodoList(items=[], file_path=str(self.todo_path))
 
         try:
-            content = self.todo_path.read_text(encoding='utf-8')
-
-            for line_num, line in enumerate(content.splitlines(), 1):
-                line = line.strip()
-
-                # Match markdown checkbox: - [ ] or - [x]
-                match = re.match(r'^-\s*\[([ xX])\]\s*(.*)$', line)
-                if match:
-                    completed = match.group(1).lower() == 'x'
-                    text = match.group(2).strip()
-
-                    # Detect priority
-                    priority = "medium"
-                    if "🔴" in text or "[high]" in text.lower():
-                        priority = "high"
-                        text = text.replace("🔴", "").replace("[high]", "").strip()
-                    elif "🟢" in text or "[low]" in text.lower():
-                        priority = "low"
-                        text = text.replace("🟢", "").replace("[low]", "").strip()
-                    elif "🟡" in text:
-                        text = text.replace("🟡", "").strip()
-
+            st = self.todo_path.stat()
+            key = (st.st_mtime_ns, st.st_size)
+            if self._cache is not None and self._cache[0] == key:
+                return _copy_list(self._cache[1])
+
+            with self.todo_path.open('rb') as f:
+                line_starts = []
+                for line_num, (offset, raw) in enumerate(_lines_with_offsets(f), 1):
+                    line_starts.append(offset)
+                    line = raw.decode('utf-8').strip()
+
+                    # Markdown checkbox: - [ ] or - [x]
+                    if not line.startswith('-'):
+                        continue
+                    box = line[1:].lstrip()
+                    if len(box) < 3 or box[0] != '[' or box[2] != ']' or box[1] not in ' xX':
+                        continue
+
+                    text, priority = _split_priority(box[3:].strip())
                     items.append(TodoItem(
                         text=text,
-                        completed=completed,
+                        completed=box[1] != ' ',
                         priority=priority,
                         line_number=line_num
                     ))
+            self._line_index = (key, line_starts)
 
-        except Exception:
-            pass
+        except (OSError, UnicodeDecodeError) as e:
+            logger.debug("Could not read %s: %s", self.todo_path, e)
+            return TodoList(items=items, file_path=str(self.todo_path))
 
-        return TodoList(items=items, file_path=str(self.todo_path))
+        todo_list = TodoList(items=items, file_path=str(self.todo_path))
+        self._cache = (key, todo_list)
+        return _copy_list(todo_list)
 
     def add(self, text: str, priority: str = "medium") -> bool:
         """Add a todo item."""
+        self._cache = None
         try:
-            content = ""
-            if self.todo_path.exists():
-                content = self.todo_path.read_text(encoding='utf-8')
-
-            if not content.strip():
-                content = "# TODO\n\n"
-
-            markers = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-            marker = markers.get(priority, "🟡")
-
-            content += f"- [ ] {marker} {text}\n"
-            self.todo_path.write_text(content, encoding='utf-8')
+            marker = _PRIORITY_MARKERS.get(priority, _PRIORITY_MARKERS["medium"])
+
+            # Append just the new line rather than rewriting the file
+            line = f"- [ ] {marker} {text}\n".encode('utf-8')
+            with open(self.todo_path, 'a+b') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    line = b"# TODO\n\n" + line
+                else:
+                    # Don't run the new item onto a last line with no newline
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) not in (b"\n", b"\r"):
+                        line = b"\n" + line
+                f.write(line)
             return True
 
-        except Exception:
+        except OSError as e:
+            logger.debug("Could not update %s: %s", self.todo_path, e)
             return False
 
+    def _line_starts(self) -> list[int]:
+        """Byte offset of each line start, reusing read()'s index if current."""
+        st = self.todo_path.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        if self._line_index is None or self._line_index[0] != key:
+            with self.todo_path.open('rb') as f:
+                line_starts = [offset for offset, _ in _lines_with_offsets(f)]
+            self._line_index = (key, line_starts)
+        return self._line_index[1]
+
     def complete(self, line_number: int) -> bool:
         """Mark a todo item as complete."""
+        self._cache = None
         try:
             if not self.todo_path.exists():
                 return False
 
-            lines = self.todo_path.read_text(encoding='utf-8').splitlines()
-
-            if 0 < line_number <= len(lines):
-                line = lines[line_number - 1]
-                if "- [ ]" in line:
-                    lines[line_number - 1] = line.replace("- [ ]", "- [x]", 1)
-                    self.todo_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
-                    return True
+            line_starts = self._line_starts()
+
+            if 0 < line_number <= len(line_starts):
+                start = line_starts[line_number - 1]
+                end = line_starts[line_number] if line_number < len(line_starts) else None
+                # Flip the checkbox in place instead of rewriting the file
+                with self.todo_path.open('r+b') as f:
+                    f.seek(start)
+                    line = f.read(end - start) if end is not None else f.read()
+                    pos = line.find(b"- [ ]")
+                    if pos >= 0:
+                        f.seek(start + pos)
+                        f.write(b"- [x]")
+                        # Flush first so the stored key carries the new mtime
+                        f.flush()
+                        st = os.fstat(f.fileno())
+                        self._line_index = ((st.st_mtime_ns, st.st_size), line_starts)
+                        return True
 
             return False
 
-        except Exception:
+        except OSError as e:
+            logger.debug("Could not update %s: %s", self.todo_path, e)
             return False
 
     def remove(self, line_number: int) -> bool:
         """Remove a todo item."""
+        self._cache = None
         try:
             if not self.todo_path.exists():
                 return False
 
-            lines = self.todo_path.read_text(encoding='utf-8').splitlines()
-
-            if 0 < line_number <= len(lines):
-                del lines[line_number - 1]
-                self.todo_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+            line_starts = self._line_starts()
+
+            if 0 < line_number <= len(line_starts):
+                start = line_starts[line_number - 1]
+                # Shift only the lines after the removed one
+                with self.todo_path.open('r+b') as f:
+                    tail = b""
+                    if line_number < len(line_starts):
+                        f.seek(line_starts[line_number])
+                        tail = f.read()
+                        f.seek(start)
+                        f.write(tail)
+                    f.truncate(start + len(tail))
+                self._line_index = None
                 return True
 
             return False
 
-        except Exception:
+        except OSError as e:
+            logger.debug("Could not update %s: %s", self.todo_path, e)
             return False